@@ -1,15 +1,50 @@
+import asyncio
 import logging
 import math
 from decimal import Decimal
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 from hummingbot.core.data_type.common import OrderType, PriceType, TradeType
 from hummingbot.core.data_type.order_candidate import OrderCandidate
 from hummingbot.core.event.events import OrderFilledEvent
+from hummingbot.core.utils.async_utils import safe_ensure_future
 from hummingbot.strategy.script_strategy_base import ScriptStrategyBase
 from hummingbot.data_feed.candles_feed.candles_factory import CandlesFactory, CandlesConfig
 from hummingbot.connector.connector_base import ConnectorBase
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the ATR update then runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+_D_ONE = Decimal("1")
+_D_HALF = Decimal("0.5")
+
+
+def _wilder_atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> float:
+    """
+    Wilder-smoothed average true range at the last bar of the given arrays
+    """
+    prev_close = close[:-1]
+    tr = np.maximum.reduce([high[1:] - low[1:], np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)])
+    if len(tr) < length:
+        return math.nan
+    # Closed form of atr = atr * (1 - alpha) + tr * alpha, seeded with the first true range
+    alpha = 1 / length
+    decay = (1 - alpha) ** np.arange(len(tr) - 1, -1, -1)
+    return float(decay[0] * tr[0] + alpha * np.dot(decay[1:], tr[1:]))
+
+
+@njit(cache=True)
+def _wilder_update(prev_atr: float, high: float, low: float, prev_close: float, length: int) -> float:
+    """
+    Advances a Wilder ATR by one bar
+    """
+    tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+    return (prev_atr * (length - 1) + tr) / length
+
 class AdaptiveMarketMaker(ScriptStrategyBase):
     """
     Adaptive Market Making Strategy (A-S Inspired)
@@ -20,9 +55,10 @@ class AdaptiveMarketMaker(ScriptStrategyBase):
     2. Inventory position
     3. Risk aversion parameters
     """
-    bid_spread = 0.001
-    ask_spread = 0.001
+    bid_spread = Decimal("0.001")
+    ask_spread = Decimal("0.001")
     order_refresh_time = 15
+    order_refresh_tolerance = Decimal("0.0005")
     order_amount = 1
     create_timestamp = 0
     trading_pair = "SOL-USDT"
@@ -32,89 +68,146 @@ class AdaptiveMarketMaker(ScriptStrategyBase):
     candle_exchange = "binance"
     candles_interval = "1m"
     candles_length = 30
-    max_records = 1000
+    features_update_interval = 5
+    max_records = candles_length * 3
      
     risk_aversion = 0.9            
-    min_spread = 0.001            
-
-    candles = CandlesFactory.get_candle(CandlesConfig(connector=candle_exchange,
-                                                     trading_pair=trading_pair,
-                                                     interval=candles_interval,
-                                                     max_records=max_records))
+    min_spread = Decimal("0.001")
 
     markets = {exchange: {trading_pair}}
 
 
     def __init__(self, connectors: Dict[str, ConnectorBase]):
         super().__init__(connectors)
+        self._base_asset, self._quote_asset = self.trading_pair.split("-")
+        self._atr = None
+        self._natr = None
+        self._prev_close = None
+        self._last_bar_ts = None
+        self._last_quotes = None
+        self._last_bid_spread = None
+        self._last_ask_spread = None
+        self._last_ref_price = None
+        # Compile the ATR update now rather than inside _features_loop, where it would block the event loop
+        _wilder_update(0.0, 0.0, 0.0, 0.0, self.candles_length)
+        self.candles = CandlesFactory.get_candle(CandlesConfig(connector=self.candle_exchange,
+                                                               trading_pair=self.trading_pair,
+                                                               interval=self.candles_interval,
+                                                               max_records=self.max_records))
         self.candles.start()
+        self._features_task = safe_ensure_future(self._features_loop())
         self.log_with_clock(logging.INFO, "Adaptive Market Maker initialized")
         self.notify_hb_app("Adaptive Market Maker initialized")
 
     def on_stop(self):
+        self._features_task.cancel()
         self.candles.stop()
         self.log_with_clock(logging.INFO, "Strategy stopped")
 
     def on_tick(self):
         if self.create_timestamp <= self.current_timestamp:
-            self.log_with_clock(logging.INFO, "Tick - refreshing orders")
-            self.cancel_all_orders()
-            proposal: List[OrderCandidate] = self.create_proposal()
-            proposal_adjusted: List[OrderCandidate] = self.adjust_proposal_to_budget(proposal)
-            self.place_orders(proposal_adjusted)
+            connector = self.connectors[self.exchange]
+            ref_price = connector.get_price_by_type(self.trading_pair, self.price_source)
+            if ref_price.is_nan():
+                self.log_with_clock(logging.INFO, "No reference price available yet, skipping refresh")
+                return
+            base_balance = connector.get_balance(self._base_asset)
+            quote_balance = connector.get_balance(self._quote_asset)
+            spreads = self.calculate_spreads(ref_price, base_balance, quote_balance)
+            if spreads is None:
+                bid_spread, ask_spread = self.bid_spread, self.ask_spread
+            else:
+                bid_spread, ask_spread = spreads
+                self._last_bid_spread, self._last_ask_spread, self._last_ref_price = bid_spread, ask_spread, ref_price
+            proposal: List[OrderCandidate] = self.create_proposal(ref_price, bid_spread, ask_spread)
+            if self.quotes_within_tolerance(proposal):
+                self.log_with_clock(logging.INFO, "Tick - quotes within tolerance, keeping orders")
+            else:
+                self.log_with_clock(logging.INFO, "Tick - refreshing orders")
+                self.cancel_all_orders()
+                proposal_adjusted: List[OrderCandidate] = self.adjust_proposal_to_budget(proposal)
+                self.place_orders(proposal_adjusted)
+                self._last_quotes = [order.price for order in proposal_adjusted] or None
             self.create_timestamp = self.order_refresh_time + self.current_timestamp
 
-    def get_candles_with_features(self):
+    async def _features_loop(self):
+        """
+        Keeps the NATR snapshot up to date in the background so on_tick never touches the candles frame
+        """
+        while True:
+            try:
+                self.update_candle_features()
+            except Exception as e:
+                self.log_with_clock(logging.ERROR, f"Error updating candle features: {e}")
+            await asyncio.sleep(self.features_update_interval)
+
+    def update_candle_features(self):
+        """
+        Folds the candles closed since the last call into the Wilder ATR and refreshes the NATR snapshot
+        """
         candles_df = self.candles.candles_df
-        
-        candles_df.ta.rsi(length=self.candles_length, append=True)
-        
-        candles_df.ta.natr(length=self.candles_length, scalar=1, append=True)
-        
-        return candles_df
+        if len(candles_df) < 2:
+            return
+
+        # The last candle is still forming, so nothing changes until the one before it is new
+        closed_ts = float(candles_df["timestamp"].iloc[-2])
+        if closed_ts == self._last_bar_ts:
+            return
+
+        # timestamp, high, low, close of the closed candles
+        bars = candles_df[["timestamp", "high", "low", "close"]].to_numpy(dtype=float)[:-1]
+
+        n = self.candles_length
+        if self._atr is None:
+            atr = _wilder_atr(bars[:, 1], bars[:, 2], bars[:, 3], n)
+            if math.isnan(atr):
+                return
+            self._atr = atr
+        else:
+            for high, low, close in bars[bars[:, 0] > self._last_bar_ts, 1:]:
+                self._atr = _wilder_update(self._atr, high, low, self._prev_close, n)
+                self._prev_close = close
+
+        self._prev_close = float(bars[-1, 3])
+        self._last_bar_ts = closed_ts
+        self._natr = float(self._atr / self._prev_close)
 
-    def calculate_spreads(self):
+    def calculate_spreads(self, ref_price: Decimal, base_balance: Decimal,
+                          quote_balance: Decimal) -> Optional[Tuple[Decimal, Decimal]]:
         """
         Calculate optimal bid and ask spreads using A-S inspired approach
+
+        Volatility comes from the NATR snapshot kept by _features_loop. Returns None when the
+        spreads cannot be calculated yet and the caller should fall back to the defaults
         """
+        if not self.ready_to_trade:
+            return None
+
         try:
-            candles_df = self.get_candles_with_features()
-            
-            if candles_df.empty:
+            natr = self._natr
+            if natr is None:
                 self.log_with_clock(logging.INFO, "No candles data available yet, using default spreads")
-                return self.bid_spread, self.ask_spread
-                
+                return None
+            volatility = Decimal(str(natr))
 
-            natr_col = f"NATR_{self.candles_length}"
-            if natr_col in candles_df.columns:
-                volatility = float(candles_df[natr_col].iloc[-1])
-            else:
-                volatility = 0.001  
-                
-            base_balance = float(self.connectors[self.exchange].get_balance(self.trading_pair.split("-")[0]))
-            quote_balance = float(self.connectors[self.exchange].get_price_by_type(self.trading_pair, self.price_source)) * float(self.connectors[self.exchange].get_balance(self.trading_pair.split("-")[1]))
-            
-            total_value = base_balance + quote_balance
+            base_value = base_balance * ref_price
+            total_value = base_value + quote_balance
             if total_value > 0:
-                inventory_ratio = base_balance / total_value
+                inventory_ratio = base_value / total_value
             else:
-                inventory_ratio = 0.5
+                inventory_ratio = _D_HALF
                 
                 
-            target_ratio = 0.5
+            target_ratio = _D_HALF
             inventory_deviation = inventory_ratio - target_ratio
             
             base_spread = max(self.min_spread, volatility * 5)
             
-            if inventory_deviation > 0:  # Long position
-                # Widen ask to sell more, tighten bid to buy less
-                bid_spread = max(self.min_spread, base_spread * (1 - inventory_deviation * 0.5))
-                ask_spread = max(self.min_spread, base_spread * (1 + inventory_deviation * 0.5))
-            else:  # Short position
-                # Tighten ask to sell less, widen bid to buy more
-                inventory_deviation = abs(inventory_deviation)
-                bid_spread = max(self.min_spread, base_spread * (1 + inventory_deviation * 0.5))
-                ask_spread = max(self.min_spread, base_spread * (1 - inventory_deviation * 0.5))
+            # A-S skew: a long inventory pulls the reservation price below mid, so the bid
+            # widens and the ask tightens to shed inventory; a short inventory does the opposite
+            skew = inventory_deviation * _D_HALF
+            bid_spread = max(self.min_spread, base_spread * (_D_ONE + skew))
+            ask_spread = max(self.min_spread, base_spread * (_D_ONE - skew))
             
             self.log_with_clock(logging.INFO, 
                                f"Calculated spreads: bid={bid_spread:.6f}, ask={ask_spread:.6f}, "
@@ -122,17 +215,13 @@ class AdaptiveMarketMaker(ScriptStrategyBase):
             
             return bid_spread, ask_spread
         
-        except Exception as e:
+        except (KeyError, ValueError, ArithmeticError) as e:
             self.log_with_clock(logging.ERROR, f"Error calculating spreads: {e}, using defaults")
-            return self.bid_spread, self.ask_spread
+            return None
 
-    def create_proposal(self) -> List[OrderCandidate]:
-        ref_price = self.connectors[self.exchange].get_price_by_type(self.trading_pair, self.price_source)
-        
-        bid_spread, ask_spread = self.calculate_spreads()
-        
-        buy_price = ref_price * Decimal(1 - bid_spread)
-        sell_price = ref_price * Decimal(1 + ask_spread)
+    def create_proposal(self, ref_price: Decimal, bid_spread: Decimal, ask_spread: Decimal) -> List[OrderCandidate]:
+        buy_price = ref_price * (_D_ONE - bid_spread)
+        sell_price = ref_price * (_D_ONE + ask_spread)
         
         best_bid = self.connectors[self.exchange].get_price(self.trading_pair, False)
         best_ask = self.connectors[self.exchange].get_price(self.trading_pair, True)
@@ -151,6 +240,18 @@ class AdaptiveMarketMaker(ScriptStrategyBase):
         
         return [buy_order, sell_order]
 
+    def quotes_within_tolerance(self, proposal: List[OrderCandidate]) -> bool:
+        """
+        True when the resting orders are all still live and every proposed price is within
+        order_refresh_tolerance of the price it was placed at
+        """
+        if self._last_quotes is None or len(proposal) != len(self._last_quotes):
+            return False
+        if len(self.get_active_orders(connector_name=self.exchange)) != len(self._last_quotes):
+            return False
+        return all(abs(order.price - last_price) / last_price <= self.order_refresh_tolerance
+                   for order, last_price in zip(proposal, self._last_quotes))
+
     def adjust_proposal_to_budget(self, proposal: List[OrderCandidate]) -> List[OrderCandidate]:
         proposal_adjusted = self.connectors[self.exchange].budget_checker.adjust_candidates(proposal, all_or_none=True)
         
@@ -186,6 +287,8 @@ class AdaptiveMarketMaker(ScriptStrategyBase):
         msg = (f"{event.trade_type.name} {round(event.amount, 2)} {event.trading_pair} {self.exchange} at {round(event.price, 2)}")
         self.log_with_clock(logging.INFO, msg)
         self.notify_hb_app_with_timestamp(msg)
+        # Force a full refresh so the filled side is re-quoted
+        self._last_quotes = None
 
     def format_status(self) -> str:
         """
@@ -207,8 +310,8 @@ class AdaptiveMarketMaker(ScriptStrategyBase):
         lines.extend(["\n----------------------------------------------------------------------\n"])
         lines.extend(["  Strategy Metrics:"])
         
-        base_asset = self.trading_pair.split("-")[0]
-        quote_asset = self.trading_pair.split("-")[1]
+        base_asset = self._base_asset
+        quote_asset = self._quote_asset
         base_balance = float(self.connectors[self.exchange].get_balance(base_asset))
         quote_balance = float(self.connectors[self.exchange].get_balance(quote_asset))
         mid_price = float(self.connectors[self.exchange].get_price_by_type(self.trading_pair, self.price_source))
@@ -221,12 +324,17 @@ class AdaptiveMarketMaker(ScriptStrategyBase):
             inventory_ratio = (base_balance * mid_price) / total_value * 100
             lines.extend([f"  Inventory Ratio: {inventory_ratio:.2f}% in {base_asset}"])
         
-        bid_spread, ask_spread = self.calculate_spreads()
-        lines.extend([f"  Bid Spread: {bid_spread*100:.4f}%, Ask Spread: {ask_spread*100:.4f}%"])
+        natr = self._natr
+        lines.extend([f"  Volatility (NATR): {natr:.6f}" if natr is not None else "  Volatility (NATR): n/a"])
+        if self._last_bid_spread is None:
+            lines.extend(["  Spreads: not calculated yet"])
+        else:
+            lines.extend([f"  Last Reference Price: {self._last_ref_price:.4f}"])
+            lines.extend([f"  Bid Spread: {self._last_bid_spread*100:.4f}%, Ask Spread: {self._last_ask_spread*100:.4f}%"])
         
         lines.extend(["\n----------------------------------------------------------------------\n"])
-        candles_df = self.get_candles_with_features()
         lines.extend([f"  Candles: {self.candles.name} | Interval: {self.candles.interval}", ""])
+        candles_df = self.candles.candles_df
         
         if not candles_df.empty:
             display_df = candles_df.tail(5).iloc[::-1]